@@ -5,83 +5,336 @@ With stock ticker lookup for winners
 """
 
 import os
+import re
 import sys
+import math
 import time
+import queue
+import sqlite3
+import signal
+import atexit
+import importlib.util
 import logging
+from collections import OrderedDict
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener, RotatingFileHandler
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from threading import Thread
+from threading import Event, Lock, Thread
 import telebot
 import requests
-from typing import List, Dict, Tuple, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Container, List, Dict, Tuple, Optional
 from flask import Flask, request
 
-# Setup logging
+# Fast JSON (optional) - falls back to stdlib json
+try:
+    import orjson
+
+    def json_loads(data):
+        return orjson.loads(data)
+
+    def json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    import json
+
+    def json_loads(data):
+        return json.loads(data)
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+# Setup logging - records are queued and written by a background listener,
+# so scan/fetch threads never block on the log file or stdout.
+# The log file is size-capped and written in small batches (immediately on errors).
+_log_queue = queue.Queue(-1)
+_log_listener = QueueListener(
+    _log_queue,
+    MemoryHandler(
+        capacity=64,
+        flushLevel=logging.ERROR,
+        target=RotatingFileHandler('bot.log', maxBytes=5_000_000, backupCount=3)
+    ),
+    logging.StreamHandler(sys.stdout)
+)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
+    handlers=[QueueHandler(_log_queue)]
 )
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
+# Separator line for scan/filter log sections
+_BANNER = "=" * 60
+
 # Flask app for webhooks
 app = Flask(__name__)
 
 
+# TED expert-query clause for result (contract award) notices
+_RESULT_QUERY = "form-type IN (result)"
+
+# Result, award, and CAN (Contract Award Notice) form types, any case
+_is_result_form = re.compile(r"result|award|can", re.IGNORECASE).search
+
+# Fields requested from the TED search API - only what filtering/alerts read
+_TED_FIELDS = (
+    "publication-number", "publication-date", "form-type",
+    "buyer-name", "buyer-country", "buyer-city", "notice-title",
+    "identifier-lot", "winner-name", "winner-country", "winner-city",
+    "tender-value", "tender-value-cur", "links"
+)
+
+# Telegram alert for one high-value contract (filled from the contract dict)
+_CONTRACT_TEMPLATE = """
+🚨 *HIGH-VALUE CONTRACT* 🚨
+
+*Publication:* {publication_number}
+*Date:* {publication_date}
+*Form:* {form_type}
+
+💰 *TOTAL VALUE: €{total_eur:,.0f}*
+
+*Buyer:* {buyer_name}
+*Country:* {buyer_country}
+
+*LOTS:*{lots_text}
+🔗 [View Contract]({url})
+"""
+
+# Thousands-grouped whole number, bound once for the alert loops
+_fmt_amount = "{:,.0f}".format
+
+# Telegram allows 4096 characters per message, keep some slack for batching
+_MAX_MESSAGE_LEN = 3800
+
+# Per-lot section of an alert; stock lines are appended when a ticker is found
+_LOT_TEMPLATE = """
+*Lot {lot_id}* - {value_text}
+Winner: {winner_name}
+"""
+
+_STOCK_TEMPLATE = """Stock: `{ticker}` {change_emoji}
+Price: {price:.2f} {currency}
+5d Change: {change_5d:+.2f}%
+"""
+
+# Characters legacy Telegram Markdown treats as entity markers
+_MD_SPECIAL_RE = re.compile(r"([_*`\[])")
+
+
+def _md_escape(text) -> str:
+    """Escape TED-supplied text so it can't break the alert's Markdown"""
+    return _MD_SPECIAL_RE.sub(r"\\\1", str(text))
+
+
+# Per-lot notice fields that are used as plain lists
+_LOT_LIST_FIELDS = ("identifier-lot", "winner-country", "tender-value", "tender-value-cur")
+
+
+def _to_list(data) -> List:
+    """Normalize a TED field value to a list (None -> [])"""
+    if isinstance(data, list):
+        return data
+    return [] if data is None else [data]
+
+
+def _to_float(value) -> Optional[float]:
+    """Parse a TED amount, None when it isn't a number"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and value:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+# Preferred languages for multilingual TED fields, in order
+_WINNER_LANGS = ('eng', 'swe', 'deu', 'fra', 'spa')
+_I18N_LANGS = _WINNER_LANGS + ('ita', 'nld', 'pol', 'ces', 'hun')
+
+
+def _extract_i18n(data, langs: Tuple[str, ...] = _I18N_LANGS):
+    """Pick one value from an i18n dict ({"eng": [...], ...}), other values pass through"""
+    if not isinstance(data, dict):
+        return data
+    for lang in langs:
+        val = data.get(lang)
+        if val:
+            return val[0] if isinstance(val, list) else val
+    first = next(iter(data.values())) if data else None
+    if isinstance(first, list):
+        return first[0] if first else None
+    return first
+
+
+def _pad(values: List, n: int, default=None) -> List:
+    """First n values, padded with default"""
+    return values[:n] + [default] * (n - len(values))
+
+
+def _spread(values: List, n: int, default, aligned: bool = False) -> List:
+    """Per-lot values: a single value applies to every lot, otherwise by index.
+    With aligned=True values are only used when there is exactly one per lot."""
+    if len(values) == 1:
+        return values * n
+    if aligned and len(values) != n:
+        return [default] * n
+    return _pad(values, n, default)
+
+
+# Common legal form at the end of a company name
+_LEGAL_SUFFIX_RE = re.compile(
+    r" (?:AB|AS|OYJ|SPA|S\.P\.A\.|SA|S\.A\.|AG|A\.G\.|PLC|LTD|LIMITED|INC|INCORPORATED"
+    r"|CORP|CORPORATION|NV|BV|GMBH|SE|ASA|OY)\Z",
+    re.IGNORECASE
+)
+
+# Yahoo Finance ticker suffixes to try, by winner country
+_EXCHANGES_BY_COUNTRY = {
+    'SE': ('ST',),       # Sweden
+    'FI': ('HE',),       # Finland
+    'NO': ('OL',),       # Norway
+    'DK': ('CO',),       # Denmark
+    'DE': ('DE', 'F'),   # Germany
+    'FR': ('PA',),       # France
+    'GB': ('L',),        # UK
+    'IT': ('MI',),       # Italy
+    'ES': ('MC',),       # Spain
+    'NL': ('AS',),       # Netherlands
+    'CH': ('SW',),       # Switzerland
+    'US': ('',),         # US (no suffix)
+}
+_DEFAULT_EXCHANGES = ('', 'US', 'L')
+_NO_COUNTRY_EXCHANGES = ('', 'US', 'L', 'PA')
+
+
 class StockLookup:
     """Lookup stock tickers and prices for companies"""
     
-    def __init__(self):
+    def __init__(self, cache_db: Optional[str] = None):
         self.logger = logging.getLogger(__name__)
-        try:
-            import yfinance as yf
-            from rapidfuzz import fuzz
-            self.yf = yf
-            self.fuzz = fuzz
-            self.enabled = True
+        # yfinance pulls in pandas/numpy, so only check it's installed here and import on first use
+        self.yf = None
+        self.fuzz = None
+        self.enabled = all(importlib.util.find_spec(name) for name in ('yfinance', 'rapidfuzz'))
+        if self.enabled:
             self.logger.info("✓ Stock lookup enabled (yfinance + rapidfuzz)")
-        except ImportError:
-            self.enabled = False
+        else:
             self.logger.warning("⚠ Stock lookup disabled - install yfinance and rapidfuzz")
         
-        # Cache to avoid repeated lookups
-        self.cache = {}
-    
+        # Cache to avoid repeated lookups: key -> (expires_at, value), least recently used first
+        self.cache = OrderedDict()
+        self.max_cache = 2048
+        self.cache_lock = Lock()
+        self.ticker_ttl = 7 * 86400
+        self.miss_ttl = 86400
+        self.price_ttl = 900
+
+        # Optional SQLite copy of the cache so restarts don't redo yfinance calls
+        self.db = None
+        self.db_lock = Lock()
+        if cache_db and self.enabled:
+            try:
+                db = sqlite3.connect(cache_db, isolation_level=None, check_same_thread=False)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("CREATE TABLE IF NOT EXISTS stock_cache(key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+                db.execute("DELETE FROM stock_cache WHERE expires < ?", (time.time(),))
+                self.db = db
+            except sqlite3.Error as e:
+                self.logger.warning(f"Stock cache unavailable ({cache_db}): {e}")
+
+    def _ensure_loaded(self) -> bool:
+        """Import yfinance and rapidfuzz on first lookup, True when usable"""
+        if self.yf is None and self.enabled:
+            try:
+                import yfinance as yf
+                from rapidfuzz import fuzz
+                self.fuzz = fuzz
+                self.yf = yf
+            except ImportError as e:
+                self.enabled = False
+                self.logger.warning(f"⚠ Stock lookup disabled - import failed: {e}")
+        return self.enabled
+
+    def _cache_get(self, key: str) -> Tuple[bool, object]:
+        """(found, value) for an unexpired cache entry, memory first, then disk"""
+        with self.cache_lock:
+            entry = self.cache.get(key)
+            if entry is not None:
+                self.cache.move_to_end(key)
+
+        if entry is None and self.db is not None:
+            try:
+                with self.db_lock:
+                    row = self.db.execute(
+                        "SELECT expires, value FROM stock_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                if row:
+                    entry = (row[0], json_loads(row[1]))
+                    self._cache_remember(key, entry)
+            except sqlite3.Error as e:
+                self.logger.warning(f"Stock cache read failed for {key}: {e}")
+
+        if entry is None or entry[0] < time.time():
+            return False, None
+        return True, entry[1]
+
+    def _cache_remember(self, key: str, entry: Tuple[float, object]):
+        """Keep an entry in memory, forgetting the least recently used beyond max_cache"""
+        with self.cache_lock:
+            self.cache[key] = entry
+            self.cache.move_to_end(key)
+            if len(self.cache) > self.max_cache:
+                self.cache.popitem(last=False)
+
+    def _cache_put(self, key: str, value, ttl: float):
+        """Cache value for ttl seconds"""
+        expires = time.time() + ttl
+        self._cache_remember(key, (expires, value))
+        if self.db is not None:
+            try:
+                with self.db_lock:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO stock_cache VALUES (?, ?, ?)", (key, json_dumps(value), expires)
+                    )
+            except sqlite3.Error as e:
+                self.logger.warning(f"Stock cache write failed for {key}: {e}")
+
     def find_ticker(self, company_name: str, country: str = None) -> Optional[str]:
         """Find stock ticker using fuzzy matching"""
         if not self.enabled or not company_name or company_name == "N/A":
             return None
         
         # Check cache
-        cache_key = company_name.lower()
-        if cache_key in self.cache:
-            self.logger.info(f"Cache hit for {company_name}: {self.cache[cache_key]}")
-            return self.cache[cache_key]
+        cache_key = f"ticker:{company_name.lower()}"
+        found, symbol = self._cache_get(cache_key)
+        if found:
+            self.logger.debug("Cache hit for %s: %s", company_name, symbol)
+            return symbol
+
+        if not self._ensure_loaded():
+            return None
         
-        self.logger.info(f"Looking up ticker for: {company_name} (Country: {country})")
+        self.logger.debug("Looking up ticker for: %s (Country: %s)", company_name, country)
         
         try:
             # Clean company name - remove common suffixes first
             clean_name = company_name.strip()
             
             # Remove common legal suffixes
-            remove_suffixes = [' AB', ' AS', ' OYJ', ' SPA', ' S.P.A.', ' SA', ' S.A.', 
-                              ' AG', ' A.G.', ' PLC', ' LTD', ' LIMITED', ' INC', 
-                              ' INCORPORATED', ' CORP', ' CORPORATION', ' NV', ' BV',
-                              ' GMBH', ' SE', ' ASA', ' OY']
-            
-            for suffix in remove_suffixes:
-                if clean_name.upper().endswith(suffix):
-                    clean_name = clean_name[:-len(suffix)].strip()
-                    break
+            clean_name = _LEGAL_SUFFIX_RE.sub('', clean_name).strip()
             
-            self.logger.info(f"Cleaned name: {clean_name}")
+            self.logger.debug("Cleaned name: %s", clean_name)
             
             # Get exchanges to search
             exchanges = self._get_exchanges_for_country(country)
-            self.logger.info(f"Searching exchanges: {exchanges}")
+            self.logger.debug("Searching exchanges: %s", exchanges)
             
             # Try each exchange
             for exchange in exchanges:
@@ -90,7 +343,7 @@ class StockLookup:
                 else:
                     search_term = clean_name
                 
-                self.logger.info(f"Trying: {search_term}")
+                self.logger.debug("Trying: %s", search_term)
                 
                 try:
                     ticker = self.yf.Ticker(search_term)
@@ -101,7 +354,7 @@ class StockLookup:
                     if info and len(info) > 1 and info.get('symbol'):
                         symbol = info['symbol']
                         self.logger.info(f"✓ Found ticker: {symbol}")
-                        self.cache[cache_key] = symbol
+                        self._cache_put(cache_key, symbol, self.ticker_ttl)
                         return symbol
                 except Exception as e:
                     self.logger.debug(f"Failed {search_term}: {e}")
@@ -109,42 +362,34 @@ class StockLookup:
             
             # Cache negative result
             self.logger.info(f"✗ No ticker found for {company_name}")
-            self.cache[cache_key] = None
+            self._cache_put(cache_key, None, self.miss_ttl)
             return None
             
         except Exception as e:
             self.logger.error(f"Ticker lookup error for {company_name}: {e}")
             return None
     
-    def _get_exchanges_for_country(self, country: str) -> List[str]:
+    def _get_exchanges_for_country(self, country: str) -> Tuple[str, ...]:
         """Get likely stock exchanges for a country"""
         if not country:
-            return ['', 'US', 'L', 'PA']
-        
-        country = country.upper()
-        exchange_map = {
-            'SE': ['ST'],  # Sweden
-            'FI': ['HE'],  # Finland
-            'NO': ['OL'],  # Norway
-            'DK': ['CO'],  # Denmark
-            'DE': ['DE', 'F'],  # Germany
-            'FR': ['PA'],  # France
-            'GB': ['L'],   # UK
-            'IT': ['MI'],  # Italy
-            'ES': ['MC'],  # Spain
-            'NL': ['AS'],  # Netherlands
-            'CH': ['SW'],  # Switzerland
-            'US': [''],    # US (no suffix)
-        }
-        
-        return exchange_map.get(country, ['', 'US', 'L'])
+            return _NO_COUNTRY_EXCHANGES
+
+        return _EXCHANGES_BY_COUNTRY.get(country.upper(), _DEFAULT_EXCHANGES)
     
     def get_stock_info(self, ticker: str) -> Optional[Dict]:
         """Get stock price and 5-day performance"""
         if not self.enabled or not ticker:
             return None
-        
-        self.logger.info(f"Fetching stock info for: {ticker}")
+
+        cache_key = f"price:{ticker}"
+        found, stock_info = self._cache_get(cache_key)
+        if found:
+            return stock_info
+
+        if not self._ensure_loaded():
+            return None
+
+        self.logger.debug("Fetching stock info for: %s", ticker)
         
         try:
             stock = self.yf.Ticker(ticker)
@@ -158,23 +403,75 @@ class StockLookup:
             price_5d_ago = hist['Close'].iloc[0]
             change_pct = ((current_price - price_5d_ago) / price_5d_ago) * 100
             
-            info = stock.info
-            currency = info.get('currency', 'USD')
+            # fast_info reads the currency from the history metadata we just fetched,
+            # .info would issue a separate quoteSummary request
+            try:
+                currency = stock.fast_info['currency'] or 'USD'
+            except Exception:
+                currency = 'USD'
             
             self.logger.info(f"✓ Stock data: {ticker} @ {current_price:.2f} {currency} ({change_pct:+.2f}%)")
             
-            return {
+            stock_info = {
                 'ticker': ticker,
-                'price': current_price,
-                'change_5d': change_pct,
+                'price': float(current_price),
+                'change_5d': float(change_pct),
                 'currency': currency
             }
+            self._cache_put(cache_key, stock_info, self.price_ttl)
+            return stock_info
             
         except Exception as e:
             self.logger.error(f"Failed to get stock info for {ticker}: {e}")
             return None
 
 
+class TokenBucket:
+    """Thread-safe token bucket for pacing API requests"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.default_rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+    def update_from_headers(self, headers):
+        """Slow down when X-RateLimit-* headers say the quota is nearly used"""
+        remaining = headers.get("X-RateLimit-Remaining", "")
+        reset = headers.get("X-RateLimit-Reset", "")
+        if not remaining.isdigit():
+            return
+
+        if int(remaining) >= self.capacity or not reset.isdigit():
+            self.rate = self.default_rate
+            return
+
+        # Reset is either seconds left or an epoch timestamp
+        reset_in = int(reset)
+        if reset_in > 1_000_000_000:
+            reset_in -= time.time()
+
+        self.rate = min(self.default_rate, max(int(remaining), 1) / max(reset_in, 1))
+
+
 class TEDDataCollector:
     """Complete TED collector with 3-step logic"""
 
@@ -183,6 +480,36 @@ class TEDDataCollector:
         self.search_api_url = "https://api.ted.europa.eu/v3/notices/search"
         self.logger = logging.getLogger(__name__)
 
+        # Concurrent page requests per fetch (also the connection pool size)
+        self.max_workers = 8
+        # Publication numbers the last filter run failed to process
+        self.failed_notices = set()
+        # Whether the last fetch got every page of its date window
+        self.fetch_complete = False
+
+        # One pooled keep-alive session for every page of every scan
+        self.session = requests.Session()
+        retry = Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(["POST"]),
+            raise_on_status=False
+        )
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers, max_retries=retry))
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        })
+        if api_key:
+            self.session.headers["apikey"] = api_key
+
+        # Paces page requests (burst of max_workers, then ~10/s)
+        self.rate_limiter = TokenBucket(rate=10, capacity=self.max_workers)
+
+        # (query, page) -> (etag, parsed response) for conditional requests
+        self.page_cache = {}
+
         # Exchange rates (Nov 2024)
         self.fallback_rates = {
             'USD': 0.92, 'GBP': 1.17, 'CHF': 1.06,
@@ -192,94 +519,149 @@ class TEDDataCollector:
             'ISK': 0.0066, 'TRY': 0.027, 'RUB': 0.010
         }
 
+        # Currency -> EUR multiplier, resolved with a single lookup per lot
+        self.eur_rates = {'EUR': 1.0, **self.fallback_rates}
+
     def convert_to_eur(self, amount: float, currency: str) -> float:
         """Convert amount to EUR"""
-        if currency == "EUR" or not currency:
-            return amount
-
-        if currency in self.fallback_rates:
-            return amount * self.fallback_rates[currency]
+        rate = self.eur_rates.get(currency)
+        if rate is not None:
+            return amount * rate
 
-        self.logger.warning(f"Unknown currency: {currency}")
+        if currency:
+            self.logger.warning(f"Unknown currency: {currency}")
         return amount
 
-    def fetch_all_contracts(self, days_back: int = 7) -> List[Dict]:
-        """Fetch contracts from TED API"""
+    def _fetch_page(self, request_body: Dict, page: int) -> Optional[Dict]:
+        """Fetch a single search page, returns parsed response or None"""
+        self.logger.info(f"Fetching page {page}...")
+
+        headers = {}
+
+        # Revalidate instead of re-downloading if we've seen this page before
+        cache_key = (request_body["query"], page)
+        cached = self.page_cache.get(cache_key)
+        if cached:
+            headers["If-None-Match"] = cached[0]
+
+        payload = json_dumps({**request_body, "page": page})
+
+        try:
+            self.rate_limiter.acquire()
+
+            # 429/5xx are retried with backoff (and Retry-After) by the session adapter
+            response = self.session.post(
+                self.search_api_url,
+                data=payload,
+                headers=headers,
+                timeout=(5, 30)
+            )
+            self.rate_limiter.update_from_headers(response.headers)
+
+            if response.status_code == 304 and cached:
+                self.logger.info(f"Page {page} unchanged, using cached copy")
+                return cached[1]
+
+            if response.status_code != 200:
+                self.logger.error(f"API status {response.status_code} (page {page})")
+                return None
+
+            data = json_loads(response.content)
+
+            etag = response.headers.get("ETag")
+            if etag:
+                self.page_cache[cache_key] = (etag, data)
+
+            return data
+
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Request error (page {page}): {e}")
+            return None
+
+    def fetch_all_contracts(self, days_back: int = 7, results_only: bool = True,
+                            since: Optional[str] = None) -> List[Dict]:
+        """Fetch contracts from TED API (page 1 first, then remaining pages concurrently)
+
+        With results_only, TED is asked to return only result (award) notices,
+        which is all filter_high_value_results keeps anyway. since (YYYYMMDD)
+        narrows the window to publication dates from that day on.
+        """
+        self.fetch_complete = False
         try:
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days_back)
             start_str = start_date.strftime("%Y%m%d")
             end_str = end_date.strftime("%Y%m%d")
+            if since and start_str < since <= end_str:
+                start_str = since
 
             self.logger.info(f"Fetching contracts from {start_str} to {end_str}")
 
-            all_notices = []
-            page = 1
-            limit = 50
+            # TED's maximum page size - fewer round trips
+            limit = 250
             max_pages = 10
 
-            while page <= max_pages:
-                self.logger.info(f"Fetching page {page}...")
+            date_query = f"PD={start_str}" if start_str == end_str else f"PD>={start_str} AND PD<={end_str}"
 
-                query = f"PD={start_str}" if start_str == end_str else f"PD>={start_str} AND PD<={end_str}"
+            # Try the server-side form-type filter first, plain date query if TED rejects it
+            queries = [f"{date_query} AND {_RESULT_QUERY}", date_query] if results_only else [date_query]
 
+            for query in queries:
+                # Shared by every page, only "page" differs per request
                 request_body = {
                     "query": query,
-                    "fields": [
-                        "publication-number", "publication-date", "form-type", "notice-type",
-                        "buyer-name", "buyer-country", "buyer-city",
-                        "notice-title", "contract-nature", "announcement-url",
-                        "identifier-lot", "estimated-value-lot", "estimated-value-cur-lot",
-                        "winner-name", "winner-country", "winner-city",
-                        "tender-value", "tender-value-cur", "links"
-                    ],
-                    "page": page,
+                    "fields": list(_TED_FIELDS),
                     "limit": limit,
                     "scope": "ALL",
                     "paginationMode": "PAGE_NUMBER"
                 }
 
-                headers = {
-                    "Content-Type": "application/json",
-                    "Accept": "application/json"
-                }
-
-                if self.api_key:
-                    headers["apikey"] = self.api_key
-
-                try:
-                    response = requests.post(
-                        self.search_api_url,
-                        json=request_body,
-                        headers=headers,
-                        timeout=30
-                    )
-
-                    if response.status_code != 200:
-                        self.logger.error(f"API status {response.status_code}")
-                        break
+                # Page 1 tells us how many pages there are
+                data = self._fetch_page(request_body, 1)
+                if data:
+                    break
 
-                    data = response.json()
-                    notices = data.get("notices", [])
-                    total = data.get("total", 0)
+            if not data:
+                return []
 
-                    if not notices:
-                        break
+            # Drop cached pages from older date windows
+            self.page_cache = {k: v for k, v in self.page_cache.items() if k[0] == query}
 
-                    all_notices.extend(notices)
-                    self.logger.info(f"Got {len(notices)} notices (total: {len(all_notices)}/{total})")
+            first_page = data.get("notices", [])
+            total = data.get("total", 0)
+            self.logger.info(f"Got {len(first_page)} notices (total: {total})")
 
-                    if len(all_notices) >= total or len(notices) < limit:
-                        break
+            page_results = [data]
+            complete = True
+            if len(first_page) >= limit and total > len(first_page):
+                num_pages = math.ceil(total / limit)
+                complete = num_pages <= max_pages
+                pages = range(2, min(num_pages, max_pages) + 1)
 
-                    page += 1
-                    time.sleep(0.5)
+                # Fetch remaining pages in parallel, keep page order
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pages))) as pool:
+                    page_results.extend(pool.map(lambda p: self._fetch_page(request_body, p), pages))
 
-                except requests.exceptions.RequestException as e:
-                    self.logger.error(f"Request error: {e}")
-                    break
+            # Pages can overlap while TED is publishing - keep the first copy of each notice
+            all_notices = []
+            seen = set()
+            for data in page_results:
+                if not data:
+                    complete = False
+                    continue
+                for notice in data.get("notices", []):
+                    pub_num = notice.get("publication-number")
+                    if pub_num is not None:
+                        pub_num = str(pub_num)
+                        if pub_num in seen:
+                            continue
+                        seen.add(pub_num)
+                    all_notices.append(notice)
 
             self.logger.info(f"Total fetched: {len(all_notices)}")
+            if not complete:
+                self.logger.warning("Fetch incomplete (failed pages or page cap reached)")
+            self.fetch_complete = complete
             return all_notices
 
         except Exception as e:
@@ -290,111 +672,63 @@ class TEDDataCollector:
         """Match winners to lots with currency"""
         lots = []
 
-        def to_list(data):
-            return [] if data is None else (data if isinstance(data, list) else [data])
-
-        def extract_from_dict(data):
-            if not isinstance(data, dict):
-                return data
-            for lang in ['eng', 'swe', 'deu', 'fra', 'spa']:
-                if lang in data and data[lang]:
-                    val = data[lang]
-                    return val[0] if isinstance(val, list) else val
-            first_val = next(iter(data.values())) if data else None
-            return first_val[0] if isinstance(first_val, list) else first_val
-
-        lot_ids = to_list(notice.get("identifier-lot"))
-        lot_est_values = to_list(notice.get("estimated-value-lot"))
-        lot_est_currencies = to_list(notice.get("estimated-value-cur-lot"))
-
-        winner_names_raw = notice.get("winner-name")
-        if isinstance(winner_names_raw, dict):
-            winner_names = to_list(extract_from_dict(winner_names_raw))
-        else:
-            winner_names = to_list(winner_names_raw)
-
-        winner_countries = to_list(notice.get("winner-country"))
-        
-        winner_cities_raw = notice.get("winner-city")
-        if isinstance(winner_cities_raw, dict):
-            winner_cities = to_list(extract_from_dict(winner_cities_raw))
-        else:
-            winner_cities = to_list(winner_cities_raw)
+        lot_ids, winner_countries, tender_values, tender_currencies = [
+            _to_list(notice.get(key)) for key in _LOT_LIST_FIELDS
+        ]
 
-        tender_values = to_list(notice.get("tender-value"))
-        tender_currencies = to_list(notice.get("tender-value-cur"))
+        # Names and cities may come as i18n dicts
+        winner_names = _to_list(_extract_i18n(notice.get("winner-name"), _WINNER_LANGS))
+        winner_cities = _to_list(_extract_i18n(notice.get("winner-city"), _WINNER_LANGS))
 
         num_lots = max(len(lot_ids), len(tender_values), 1)
 
-        for i in range(num_lots):
-            # Get currency
-            tender_cur = (tender_currencies[i] if i < len(tender_currencies) 
-                         else tender_currencies[0] if len(tender_currencies) == 1 
-                         else "EUR")
-            
-            est_cur = (lot_est_currencies[i] if i < len(lot_est_currencies)
-                      else lot_est_currencies[0] if len(lot_est_currencies) == 1
-                      else "EUR")
-
-            # Get winner
-            winner_name = (winner_names[i] if len(winner_names) == num_lots and i < len(winner_names)
-                          else winner_names[0] if len(winner_names) == 1
-                          else "N/A")
-            
-            winner_country = (winner_countries[i] if len(winner_countries) == num_lots and i < len(winner_countries)
-                             else winner_countries[0] if len(winner_countries) == 1
-                             else "N/A")
-            
-            winner_city = (winner_cities[i] if len(winner_cities) == num_lots and i < len(winner_cities)
-                          else winner_cities[0] if len(winner_cities) == 1
-                          else "N/A")
-
-            lot_data = {
-                "lot_id": lot_ids[i] if i < len(lot_ids) else f"LOT-{i+1}",
-                "estimated_value": lot_est_values[i] if i < len(lot_est_values) else None,
-                "estimated_currency": est_cur,
-                "tender_value": tender_values[i] if i < len(tender_values) else None,
+        # Line every field up to one value per lot, then build lots in a single pass
+        lot_ids = lot_ids + [f"LOT-{i+1}" for i in range(len(lot_ids), num_lots)]
+        per_lot = zip(
+            lot_ids,
+            _pad(tender_values, num_lots),
+            _spread(tender_currencies, num_lots, "EUR"),
+            _spread(winner_names, num_lots, "N/A", aligned=True),
+            _spread(winner_countries, num_lots, "N/A", aligned=True),
+            _spread(winner_cities, num_lots, "N/A", aligned=True),
+        )
+
+        for lot_id, tender_value, tender_cur, winner_name, winner_country, winner_city in per_lot:
+            lots.append({
+                "lot_id": lot_id,
+                "tender_value": tender_value,
                 "tender_currency": tender_cur,
                 "winner_name": winner_name,
                 "winner_country": winner_country,
                 "winner_city": winner_city,
-            }
-            lots.append(lot_data)
+            })
 
         return lots
 
-    def filter_high_value_results(self, notices: List[Dict], min_value_eur: float = 15_000_000) -> List[Dict]:
+    def filter_high_value_results(self, notices: List[Dict], min_value_eur: float = 15_000_000,
+                                  skip: Container[str] = frozenset()) -> List[Dict]:
         """
         STEP-BY-STEP FILTERING:
         1. Get ALL contracts
-        2. Filter for form-type = "result" or "award"
+        2. Filter for form-type = "result" or "award", minus publication numbers in skip
         3. Convert ALL currencies to EUR
         4. Filter for total >= €15M
         """
-        self.logger.info("="*60)
+        self.logger.info(_BANNER)
         self.logger.info("FILTERING PROCESS")
-        self.logger.info("="*60)
+        self.logger.info(_BANNER)
         self.logger.info(f"Step 1: Input contracts: {len(notices)}")
 
-        # Helper to extract from i18n dicts
-        def extract_from_dict(data):
-            if not isinstance(data, dict):
-                return data
-            for lang in ['eng', 'swe', 'deu', 'fra', 'spa', 'ita', 'nld', 'pol', 'ces', 'hun']:
-                if lang in data and data[lang]:
-                    val = data[lang]
-                    return val[0] if isinstance(val, list) else val
-            first = next(iter(data.values())) if data else None
-            return first[0] if isinstance(first, list) else first
-
         # STEP 2: Filter for result/award type contracts
         result_notices = []
         for notice in notices:
             form_type = notice.get("form-type", "")
-            form_type_lower = str(form_type).lower()
-            
+
             # Include result, award, and CAN (Contract Award Notice) types
-            if "result" in form_type_lower or "award" in form_type_lower or "can" in form_type_lower:
+            if _is_result_form(form_type if isinstance(form_type, str) else str(form_type)):
+                # Already alerted, no need to convert or match lots again
+                if str(notice.get("publication-number")) in skip:
+                    continue
                 result_notices.append(notice)
                 self.logger.debug(f"Including: {notice.get('publication-number')} with form-type: {form_type}")
         
@@ -402,88 +736,96 @@ class TEDDataCollector:
 
         # STEP 3 & 4: Convert to EUR and filter for >= €15M
         high_value = []
+        self.failed_notices = set()
         
         for notice in result_notices:
             try:
+                # Exact EUR total straight from the notice, so lots are only built for contracts that qualify
+                values = _to_list(notice.get("tender-value"))
+                currencies = _spread(_to_list(notice.get("tender-value-cur")), len(values), "EUR")
+                total_eur = 0.0
+                for value, currency in zip(values, currencies):
+                    value = _to_float(value)
+                    if value is not None:
+                        total_eur += self.convert_to_eur(value, currency)
+
+                # Written as "not >=" so a NaN total is rejected too
+                if not total_eur >= min_value_eur:
+                    if total_eur > 0:
+                        self.logger.debug(f"Contract {notice.get('publication-number')}: €{total_eur:,.0f}")
+                    continue
+
                 lots = self.match_winners_to_lots(notice)
                 if not lots:
                     continue
 
-                # Calculate total EUR value
-                total_eur = 0
+                # Per-lot EUR values for the alert
                 converted_lots = []
 
                 for lot in lots:
                     tender_value = lot.get('tender_value')
                     tender_currency = lot.get('tender_currency', 'EUR')
                     
-                    if tender_value:
-                        try:
-                            tender_float = float(tender_value)
-                            eur_value = self.convert_to_eur(tender_float, tender_currency)
-                            total_eur += eur_value
-
-                            converted_lots.append({
-                                "lot_id": lot['lot_id'],
-                                "winner_name": lot['winner_name'],
-                                "winner_country": lot['winner_country'],
-                                "winner_city": lot['winner_city'],
-                                "tender_value": tender_float,
-                                "tender_currency": tender_currency,
-                                "eur_value": eur_value
-                            })
-                        except (ValueError, TypeError):
-                            continue
-
-                # Log ALL result contracts with values (for debugging)
-                if total_eur > 0:
-                    self.logger.info(f"Contract {notice.get('publication-number')}: €{total_eur:,.0f}")
-
-                # Check if meets €15M threshold
-                if total_eur >= min_value_eur:
-                    # Extract URL from links object
-                    links = notice.get('links', {})
-                    html_links = links.get('html', {}) if isinstance(links, dict) else {}
-                    
-                    url = "N/A"
-                    for lang_code in ['ENG', 'SWE', 'DEU', 'FRA', 'SPA', 'ITA', 'NLD']:
-                        if lang_code in html_links:
-                            url = html_links[lang_code]
-                            break
-                    
-                    # Extract buyer info
-                    buyer_name = extract_from_dict(notice.get("buyer-name", "N/A"))
-                    
-                    buyer_country_raw = notice.get("buyer-country", "N/A")
-                    if isinstance(buyer_country_raw, list):
-                        buyer_country = buyer_country_raw[0] if buyer_country_raw else "N/A"
-                    else:
-                        buyer_country = buyer_country_raw
-                    
-                    buyer_city = extract_from_dict(notice.get("buyer-city", "N/A"))
-                    title = extract_from_dict(notice.get("notice-title", "N/A"))
-                    
-                    high_value.append({
-                        "publication_number": notice.get("publication-number", "N/A"),
-                        "publication_date": notice.get("publication-date", "N/A"),
-                        "form_type": form_type,
-                        "buyer_name": buyer_name,
-                        "buyer_country": buyer_country,
-                        "buyer_city": buyer_city,
-                        "title": title,
-                        "url": url,
-                        "total_eur": total_eur,
-                        "lots": converted_lots
+                    tender_float = _to_float(tender_value) if tender_value else None
+                    if tender_float is None:
+                        continue
+
+                    eur_value = self.convert_to_eur(tender_float, tender_currency)
+
+                    converted_lots.append({
+                        "lot_id": lot['lot_id'],
+                        "winner_name": lot['winner_name'],
+                        "winner_country": lot['winner_country'],
+                        "winner_city": lot['winner_city'],
+                        "tender_value": tender_float,
+                        "tender_currency": tender_currency,
+                        "eur_value": eur_value
                     })
 
-                    self.logger.info(f"  ✅ HIGH-VALUE: {notice.get('publication-number')} = €{total_eur:,.0f}")
+                # Extract URL from links object
+                links = notice.get('links', {})
+                html_links = links.get('html', {}) if isinstance(links, dict) else {}
+                
+                url = "N/A"
+                for lang_code in ['ENG', 'SWE', 'DEU', 'FRA', 'SPA', 'ITA', 'NLD']:
+                    if lang_code in html_links:
+                        url = html_links[lang_code]
+                        break
+                
+                # Extract buyer info
+                buyer_name = _extract_i18n(notice.get("buyer-name", "N/A"))
+                
+                buyer_country_raw = notice.get("buyer-country", "N/A")
+                if isinstance(buyer_country_raw, list):
+                    buyer_country = buyer_country_raw[0] if buyer_country_raw else "N/A"
+                else:
+                    buyer_country = buyer_country_raw
+                
+                buyer_city = _extract_i18n(notice.get("buyer-city", "N/A"))
+                title = _extract_i18n(notice.get("notice-title", "N/A"))
+                
+                high_value.append({
+                    "publication_number": notice.get("publication-number", "N/A"),
+                    "publication_date": notice.get("publication-date", "N/A"),
+                    "form_type": notice.get("form-type", ""),
+                    "buyer_name": buyer_name,
+                    "buyer_country": buyer_country,
+                    "buyer_city": buyer_city,
+                    "title": title,
+                    "url": url,
+                    "total_eur": total_eur,
+                    "lots": converted_lots
+                })
+
+                self.logger.info(f"  ✅ HIGH-VALUE: {notice.get('publication-number')} = €{total_eur:,.0f}")
 
             except Exception as e:
                 self.logger.error(f"Processing error: {e}", exc_info=True)
+                self.failed_notices.add(str(notice.get("publication-number")))
                 continue
 
         self.logger.info(f"Step 4: High-value contracts (>= €{min_value_eur:,.0f}): {len(high_value)}")
-        self.logger.info("="*60)
+        self.logger.info(_BANNER)
         
         return high_value
 
@@ -491,15 +833,60 @@ class TEDDataCollector:
 class TEDTelegramBot:
     """Telegram bot with webhook support and stock lookup"""
 
-    def __init__(self, bot_token: str, chat_id: str, ted_api_key: str):
+    def __init__(self, bot_token: str, chat_id: str, ted_api_key: str,
+                 notified_db: Optional[str] = None, stock_cache_db: Optional[str] = None):
         self.bot = telebot.TeleBot(bot_token)
         self.chat_id = chat_id
         self.collector = TEDDataCollector(api_key=ted_api_key)
-        self.stock_lookup = StockLookup()
+        self.stock_lookup = StockLookup(cache_db=stock_cache_db)
         self.is_running = False
-        self.notified = set()
+        self.wake_event = Event()
+        # (publication numbers, alert message) pairs waiting for _send_worker
+        self.outbox = queue.Queue()
+        # Publication numbers on the outbox, marked notified once their message is sent
+        self.queued = set()
+        # Publication numbers whose alert failed to send, re-evaluated next scan
+        self.unsent = set()
+        # Guards queued/unsent/evaluated between scans and _send_worker
+        self.state_lock = Lock()
+        # Publication numbers already alerted, oldest first (bounded LRU)
+        self.notified = OrderedDict()
+        self.max_notified = 50_000
+        # Publication numbers fetched by the previous scan
+        self.evaluated = set()
+        # Newest publication date (YYYYMMDD) seen, later scans fetch from there
+        self.last_pub_date = None
+        # Optional SQLite copy of self.notified so restarts don't re-alert
+        self.db = None
+        self.db_lock = Lock()
+        if notified_db:
+            self._load_notified(notified_db)
 
         self._setup_handlers()
+        Thread(target=self._send_worker, daemon=True).start()
+
+    def _load_notified(self, path: str):
+        """Open the notified store and preload the most recent entries"""
+        try:
+            db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS notified(pub_num TEXT PRIMARY KEY, ts INTEGER)")
+            rows = db.execute(
+                "SELECT pub_num FROM notified ORDER BY ts DESC, rowid DESC LIMIT ?", (self.max_notified,)
+            ).fetchall()
+            # Rows beyond the in-memory cap would never be consulted again
+            db.execute(
+                "DELETE FROM notified WHERE pub_num NOT IN "
+                "(SELECT pub_num FROM notified ORDER BY ts DESC, rowid DESC LIMIT ?)", (self.max_notified,)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Notified store unavailable ({path}): {e}")
+            return
+
+        for (pub_num,) in reversed(rows):
+            self.notified[pub_num] = None
+        self.db = db
+        logger.info(f"Loaded {len(self.notified)} notified contracts from {path}")
 
     def _setup_handlers(self):
 
@@ -611,6 +998,7 @@ Price: {stock_info['price']:.2f} {stock_info['currency']}
         def resume(message):
             if not self.is_running:
                 self.is_running = True
+                self.wake_event.set()
                 self.bot.reply_to(message, "▶️ Resumed!")
             else:
                 self.bot.reply_to(message, "Already running")
@@ -618,30 +1006,64 @@ Price: {stock_info['price']:.2f} {stock_info['currency']}
     def _scan(self) -> int:
         """Run 3-step scan"""
         try:
-            logger.info("="*60)
+            logger.info(_BANNER)
             logger.info("STARTING TED SCAN")
-            logger.info("="*60)
+            logger.info(_BANNER)
 
-            notices = self.collector.fetch_all_contracts(days_back=2)
+            notices = self.collector.fetch_all_contracts(days_back=2, since=self.last_pub_date)
             if not notices:
                 logger.info("No contracts found")
                 return 0
 
-            high_value_contracts = self.collector.filter_high_value_results(notices)
+            # Published notices don't change, so only evaluate ones the last scan didn't see
+            fetched = {str(n["publication-number"]) for n in notices if n.get("publication-number")}
+            fresh = [n for n in notices if str(n.get("publication-number")) not in self.evaluated]
+            # Contracts TED still returns stay recent, so the LRU doesn't evict and re-alert them
+            self._refresh_notified([pub_num for pub_num in fetched if pub_num in self.notified])
+            logger.info(f"New since last scan: {len(fresh)} of {len(notices)}")
+
+            high_value_contracts = self.collector.filter_high_value_results(fresh, skip=self.notified)
 
-            new_count = 0
+            new_contracts = []
             for contract in high_value_contracts:
                 pub_num = str(contract["publication_number"])
 
-                if pub_num in self.notified:
+                if pub_num in self.notified or pub_num in self.queued:
                     continue
 
-                self._notify(contract)
-                self.notified.add(pub_num)
-                new_count += 1
+                new_contracts.append(contract)
+
+            stocks = self._prefetch_stocks(new_contracts)
+
+            alerts = []
+            for contract in new_contracts:
+                pub_num = str(contract["publication_number"])
+                alert = self._build_alert(contract, stocks)
+                with self.state_lock:
+                    self.unsent.discard(pub_num)
+                    if alert:
+                        self.queued.add(pub_num)
+                if alert:
+                    alerts.append((pub_num, alert))
+                else:
+                    self._mark_notified(pub_num)
+
+            new_count = len(alerts)
+            self._send_alerts(alerts)
+
+            # Only now is every fetched notice handled, failed ones get another go next scan
+            with self.state_lock:
+                self.evaluated = fetched - self.collector.failed_notices - self.unsent
+
+            # Next scan only needs the newest publication day seen (TED dates look like 2024-01-15+01:00),
+            # unless pages were missing - then it re-fetches the whole window
+            if self.collector.fetch_complete:
+                pub_dates = (str(n.get("publication-date", ""))[:10].replace("-", "") for n in notices)
+                self.last_pub_date = max((d for d in pub_dates if len(d) == 8 and d.isdigit()),
+                                         default=self.last_pub_date)
 
             logger.info(f"COMPLETE: {new_count} new alerts sent")
-            logger.info("="*60)
+            logger.info(_BANNER)
             return new_count
 
         except Exception as e:
@@ -649,98 +1071,205 @@ Price: {stock_info['price']:.2f} {stock_info['currency']}
             self._send(f"❌ Error: {str(e)[:100]}")
             return 0
 
-    def _notify(self, contract: dict):
-        """Send trimmed contract notification with stock info"""
+    def _mark_notified(self, pub_num: str):
+        """Remember an alerted contract, forgetting the oldest beyond max_notified"""
+        self.notified[pub_num] = None
+        self.notified.move_to_end(pub_num)
+        if len(self.notified) > self.max_notified:
+            self.notified.popitem(last=False)
+
+        if self.db is not None:
+            try:
+                with self.db_lock:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO notified VALUES (?, ?)", (pub_num, int(time.time()))
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Could not persist {pub_num}: {e}")
+
+    def _refresh_notified(self, pub_nums: List[str]):
+        """Move already notified contracts to the recent end, in memory and in the store"""
+        for pub_num in pub_nums:
+            self.notified.move_to_end(pub_num)
+
+        if self.db is not None and pub_nums:
+            now = int(time.time())
+            try:
+                with self.db_lock:
+                    # REPLACE also gives the rows a new rowid, the tiebreak for equal ts
+                    self.db.executemany(
+                        "INSERT OR REPLACE INTO notified VALUES (?, ?)", [(p, now) for p in pub_nums]
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Could not refresh notified entries: {e}")
+
+    def _send_alerts(self, alerts: List[Tuple[str, str]]):
+        """Send (publication number, alert) pairs packed into as few Telegram messages as fit the size limit"""
+        pub_nums = []
+        batch = []
+        batch_len = 0
+        for pub_num, alert in alerts:
+            if batch and batch_len + len(alert) > _MAX_MESSAGE_LEN:
+                self.outbox.put((pub_nums, "".join(batch)))
+                pub_nums = []
+                batch = []
+                batch_len = 0
+            pub_nums.append(pub_num)
+            batch.append(alert)
+            batch_len += len(alert)
+
+        if batch:
+            self.outbox.put((pub_nums, "".join(batch)))
+
+    def _send_worker(self):
+        """Deliver queued alert messages so a slow Telegram API doesn't hold up scans"""
+        while True:
+            pub_nums, message = self.outbox.get()
+            try:
+                if self._send(message):
+                    # Only persisted once sent, so alerts still queued at a redeploy go out again
+                    for pub_num in pub_nums:
+                        self._mark_notified(pub_num)
+                        self.queued.discard(pub_num)
+                else:
+                    # Not delivered - let the next scan evaluate and queue them again
+                    with self.state_lock:
+                        self.queued.difference_update(pub_nums)
+                        self.evaluated.difference_update(pub_nums)
+                        self.unsent.update(pub_nums)
+            finally:
+                self.outbox.task_done()
+
+    def _lookup_stock(self, winner: Tuple[str, str]) -> Tuple[Optional[str], Optional[Dict]]:
+        """Ticker and stock info for a (winner name, country) pair"""
+        winner_name, winner_country = winner
+        try:
+            logger.info(f"Looking up stock for: {winner_name} ({winner_country})")
+            ticker = self.stock_lookup.find_ticker(winner_name, winner_country)
+            if not ticker:
+                return None, None
+
+            logger.info(f"Found ticker: {ticker}, fetching stock info...")
+            return ticker, self.stock_lookup.get_stock_info(ticker)
+
+        except Exception as e:
+            logger.error(f"Stock lookup error for {winner_name}: {e}")
+            return None, None
+
+    def _prefetch_stocks(self, contracts: List[dict]) -> Dict[Tuple[str, str], Tuple]:
+        """Look up every distinct lot winner concurrently (yfinance calls are I/O bound)"""
+        winners = list(dict.fromkeys(
+            (lot['winner_name'], lot['winner_country'])
+            for contract in contracts for lot in contract["lots"]
+        ))
+        if not winners:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=min(8, len(winners))) as pool:
+            return dict(zip(winners, pool.map(self._lookup_stock, winners)))
+
+    def _build_alert(self, contract: dict, stocks: Dict[Tuple[str, str], Tuple]) -> Optional[str]:
+        """Build trimmed contract notification with prefetched stock info"""
         try:
             # Build lots section with stock info
-            lots_text = ""
+            lots_parts = []
             for lot in contract["lots"]:
                 winner_name = lot['winner_name']
                 winner_country = lot['winner_country']
                 
                 # Format value
-                if lot['tender_currency'] == 'EUR':
-                    value_text = f"€{lot['eur_value']:,.0f}"
-                else:
-                    value_text = f"€{lot['eur_value']:,.0f} (from {lot['tender_value']:,.0f} {lot['tender_currency']})"
+                value_text = f"€{_fmt_amount(lot['eur_value'])}"
+                if lot['tender_currency'] != 'EUR':
+                    value_text += f" (from {_fmt_amount(lot['tender_value'])} {lot['tender_currency']})"
                 
-                lots_text += f"\n*Lot {lot['lot_id']}* - {value_text}\n"
-                lots_text += f"Winner: {winner_name}\n"
-                
-                # Try to find stock ticker
-                logger.info(f"Looking up stock for: {winner_name} ({winner_country})")
-                ticker = self.stock_lookup.find_ticker(winner_name, winner_country)
+                lots_parts.append(_LOT_TEMPLATE.format_map({
+                    **lot,
+                    # Escapes don't work inside the bold entity, so just drop its closing marker
+                    "lot_id": str(lot['lot_id']).replace('*', ''),
+                    "winner_name": _md_escape(winner_name),
+                    "value_text": value_text
+                }))
                 
+                ticker, stock_info = stocks.get((winner_name, winner_country), (None, None))
+
                 if ticker:
-                    logger.info(f"Found ticker: {ticker}, fetching stock info...")
-                    stock_info = self.stock_lookup.get_stock_info(ticker)
                     if stock_info:
                         change_emoji = "📈" if stock_info['change_5d'] > 0 else "📉"
-                        lots_text += f"Stock: `{ticker}` {change_emoji}\n"
-                        lots_text += f"Price: {stock_info['price']:.2f} {stock_info['currency']}\n"
-                        lots_text += f"5d Change: {stock_info['change_5d']:+.2f}%\n"
+                        lots_parts.append(_STOCK_TEMPLATE.format_map({**stock_info, "change_emoji": change_emoji}))
                         logger.info(f"✓ Added stock info for {ticker}")
                     else:
-                        lots_text += f"Stock: `{ticker}` (no data)\n"
+                        lots_parts.append(f"Stock: `{ticker}` (no data)\n")
                         logger.warning(f"Ticker found but no stock data: {ticker}")
                 else:
                     logger.info(f"No ticker found for {winner_name}")
                 
-                lots_text += "\n"
-
-            msg = f"""
-🚨 *HIGH-VALUE CONTRACT* 🚨
-
-*Publication:* {contract['publication_number']}
-*Date:* {contract['publication_date']}
-*Form:* {contract['form_type']}
+                lots_parts.append("\n")
 
-💰 *TOTAL VALUE: €{contract['total_eur']:,.0f}*
+            lots_text = "".join(lots_parts)
 
-*Buyer:* {contract['buyer_name']}
-*Country:* {contract['buyer_country']}
-
-*LOTS:*{lots_text}
-🔗 [View Contract]({contract['url']})
-            """
-
-            self._send(msg)
+            return _CONTRACT_TEMPLATE.format_map({
+                **contract,
+                "publication_number": _md_escape(contract['publication_number']),
+                "form_type": _md_escape(contract['form_type']),
+                "buyer_name": _md_escape(contract['buyer_name']),
+                "buyer_country": _md_escape(contract['buyer_country']),
+                "lots_text": lots_text
+            })
 
         except Exception as e:
             logger.error(f"Notify error: {e}", exc_info=True)
+            return None
 
-    def _send(self, message: str):
-        """Send Telegram message"""
+    def _send(self, message: str) -> bool:
+        """Send Telegram message, True once it was delivered (plain text as a fallback)"""
         try:
-            self.bot.send_message(
-                self.chat_id,
-                message,
-                parse_mode='Markdown',
-                disable_web_page_preview=True
-            )
+            try:
+                self._send_markdown(message)
+            except telebot.apihelper.ApiTelegramException as e:
+                if e.error_code != 429:
+                    raise
+                # Rate limited - wait as long as Telegram asks, then try once more
+                retry_after = (e.result_json or {}).get('parameters', {}).get('retry_after', 1)
+                logger.warning(f"Telegram rate limit, retrying in {retry_after}s")
+                time.sleep(retry_after)
+                self._send_markdown(message)
+            return True
         except Exception as e:
             logger.error(f"Send error: {e}")
             try:
                 self.bot.send_message(self.chat_id, message)
+                return True
             except:
-                pass
+                return False
+
+    def _send_markdown(self, message: str):
+        """Send message with Markdown formatting"""
+        self.bot.send_message(
+            self.chat_id,
+            message,
+            parse_mode='Markdown',
+            disable_web_page_preview=True
+        )
 
     def _monitoring_loop(self):
         """Auto-scan every 10 minutes"""
         logger.info("Monitoring started")
         self._send("✅ *TED Monitor Started!*\n\nScanning every 10 minutes.\nYou'll receive alerts for contracts ≥€15M.")
 
-        while self.is_running:
+        while True:
+            self.wake_event.clear()
+            # Scans start every 10 minutes however long each one takes
+            next_scan = time.monotonic() + 600
             try:
-                self._scan()
-
                 if self.is_running:
-                    logger.info("Waiting 10 minutes...")
-                    time.sleep(600)
+                    self._scan()
+                    logger.info("Waiting for next scan...")
 
             except Exception as e:
                 logger.error(f"Loop error: {e}", exc_info=True)
-                time.sleep(600)
+
+            # /resume wakes the loop early
+            self.wake_event.wait(max(0.0, next_scan - time.monotonic()))
 
     def process_update(self, update):
         """Process webhook update"""
@@ -796,24 +1325,33 @@ def main():
     """Main entry point"""
     global bot_instance
 
+    # Render stops instances with SIGTERM, which would skip atexit - exit normally
+    # so the buffered log records are flushed to bot.log
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
     # Get credentials from environment
     BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '8395744940:AAGmZVdj1l-QfZ4zqGP_9XOOvO9EbsnyWLw')
     CHAT_ID = os.environ.get('TELEGRAM_CHAT_ID', '2133274440')
     TED_KEY = os.environ.get('TED_API_KEY', '0f0d8c2f68bb46bab7afa51c46053433')
-    WEBHOOK_URL = os.environ.get('WEBHOOK_URL')
+    # Render sets RENDER_EXTERNAL_URL for web services (render.yaml), so the webhook works without extra config
+    WEBHOOK_URL = os.environ.get('WEBHOOK_URL') or os.environ.get('RENDER_EXTERNAL_URL')
 
-    logger.info("="*60)
+    logger.info(_BANNER)
     logger.info("TED TELEGRAM BOT - RENDER.COM WEBHOOK MODE")
-    logger.info("="*60)
+    logger.info(_BANNER)
     logger.info(f"Chat ID: {CHAT_ID}")
     logger.info(f"Webhook: {WEBHOOK_URL}")
-    logger.info("="*60)
+    logger.info(_BANNER)
 
     # Initialize bot
     bot_instance = TEDTelegramBot(
         bot_token=BOT_TOKEN,
         chat_id=CHAT_ID,
-        ted_api_key=TED_KEY
+        ted_api_key=TED_KEY,
+        # On Render both stores must live on the persistent disk (see render.yaml),
+        # the instance filesystem is wiped on every redeploy
+        notified_db=os.environ.get('NOTIFIED_DB', 'notified.db'),
+        stock_cache_db=os.environ.get('STOCK_CACHE_DB', 'stock_cache.db')
     )
 
     # Set webhook if URL provided